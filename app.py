@@ -1,11 +1,18 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-import plotly.express as px
 from datetime import datetime, timedelta
 import yfinance as yf
 import time
+import gzip
+import hashlib
+import os
+import pickle
+
+try:
+    import talib
+except ImportError:  # TA-Lib needs its C library; fall back to the NumPy RSI
+    talib = None
 
 # Configure the page
 st.set_page_config(
@@ -78,8 +85,11 @@ st.markdown("""
 # Initialize session state for live updates
 if 'last_update' not in st.session_state:
     st.session_state.last_update = datetime.now()
-if 'price_history' not in st.session_state:
-    st.session_state.price_history = []
+PRICE_HISTORY_SIZE = 100  # Keep only last 100 price points
+if 'price_count' not in st.session_state:
+    st.session_state.price_times = np.empty(PRICE_HISTORY_SIZE, dtype='datetime64[ns]')
+    st.session_state.price_values = np.empty(PRICE_HISTORY_SIZE, dtype=np.float32)
+    st.session_state.price_count = 0
 if 'auto_refresh' not in st.session_state:
     st.session_state.auto_refresh = True
 
@@ -139,6 +149,16 @@ period_options = {
     '1 Year': '1y'
 }
 
+# Bar interval and table timestamp format for each period
+PERIOD_META = {
+    '1d': ('1m', 'HH:mm:ss'),
+    '5d': ('1m', 'HH:mm:ss'),
+    '1mo': ('1d', 'YYYY-MM-DD'),
+    '3mo': ('1d', 'YYYY-MM-DD'),
+    '6mo': ('1d', 'YYYY-MM-DD'),
+    '1y': ('1d', 'YYYY-MM-DD')
+}
+
 selected_period = st.sidebar.selectbox(
     "📅 Select Time Period",
     list(period_options.keys()),
@@ -175,101 +195,249 @@ def calculate_technical_indicators(data):
     indicators = {}
     
     if len(data) > 0:
-        # Moving averages
-        if len(data) >= 20:
-            indicators['ma_20'] = data['Close'].rolling(window=20).mean().iloc[-1]
-        if len(data) >= 50:
-            indicators['ma_50'] = data['Close'].rolling(window=50).mean().iloc[-1]
+        # Read each column once and derive every indicator from the same arrays
+        close = data['Close'].to_numpy(dtype=np.float32, copy=False)
+        high = data['High'].to_numpy(dtype=np.float32, copy=False)
+        low = data['Low'].to_numpy(dtype=np.float32, copy=False)
         
-        # RSI calculation
-        if len(data) >= 14:
-            delta = data['Close'].diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-            rs = gain / loss
-            indicators['rsi'] = 100 - (100 / (1 + rs.iloc[-1])) if not pd.isna(rs.iloc[-1]) else 50
+        # Moving averages (only the last window is needed)
+        if len(close) >= 20:
+            indicators['ma_20'] = close[-20:].mean()
+        if len(close) >= 50:
+            indicators['ma_50'] = close[-50:].mean()
         
-        # 52-week high and low
-        if len(data) >= 252:  # Approx trading days in a year
-            indicators['52_week_high'] = data['High'].rolling(window=252).max().iloc[-1]
-            indicators['52_week_low'] = data['Low'].rolling(window=252).min().iloc[-1]
-        else:
-            indicators['52_week_high'] = data['High'].max()
-            indicators['52_week_low'] = data['Low'].min()
+        # RSI calculation with Wilder's smoothing
+        if len(close) > 14 and talib is not None:
+            rsi = talib.RSI(close.astype(np.float64), timeperiod=14)[-1]
+            # TA-Lib reports 0 for a series with no movement; keep it neutral like the NumPy path
+            flat = np.all(close[1:] == close[:-1])
+            indicators['rsi'] = 50.0 if np.isnan(rsi) or flat else float(rsi)
+        elif len(close) > 14:
+            delta = np.diff(close)
+            gain = np.maximum(delta, 0)
+            loss = gain - delta
+            avg_gain = float(gain[:14].mean())
+            avg_loss = float(loss[:14].mean())
+            for g, l in zip(gain[14:].tolist(), loss[14:].tolist()):
+                avg_gain = (avg_gain * 13 + g) / 14
+                avg_loss = (avg_loss * 13 + l) / 14
+            if avg_loss == 0:
+                indicators['rsi'] = 100.0 if avg_gain > 0 else 50.0
+            else:
+                indicators['rsi'] = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+        
+        # 52-week high and low (approx 252 trading days in a year)
+        indicators['52_week_high'] = high[-252:].max()
+        indicators['52_week_low'] = low[-252:].min()
     
     return indicators
 
+# Reuse yf.Ticker objects across script reruns instead of rebuilding them each refresh
+@st.cache_resource
+def ticker_pool():
+    return {}
+
+def _ticker(symbol):
+    pool = ticker_pool()
+    if symbol not in pool:
+        pool[symbol] = yf.Ticker(symbol)
+    return pool[symbol]
+
+# Disk cache for price history so new sessions and restarts start warm
+class FileCache:
+    def __init__(self, directory='.cache'):
+        self.directory = directory
+    
+    def _path(self, symbol, period, interval):
+        key = hashlib.md5(f"{symbol}|{period}|{interval}".encode()).hexdigest()
+        return os.path.join(self.directory, f"{key}.pkl.gz")
+    
+    def get(self, symbol, period, interval, ttl):
+        path = self._path(symbol, period, interval)
+        try:
+            if time.time() - os.path.getmtime(path) > ttl:
+                return None
+        except OSError:
+            return None
+        try:
+            with gzip.open(path, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            # Unreadable entry (corrupt, or pickled by other library versions): refetch
+            self._remove(path)
+            return None
+    
+    def set(self, symbol, period, interval, data):
+        path = self._path(symbol, period, interval)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with gzip.open(tmp_path, 'wb') as f:
+                pickle.dump(data, f)
+            os.replace(tmp_path, path)
+        except Exception:
+            self._remove(tmp_path)
+    
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+file_cache = FileCache()
+CACHE_TTL = {'1m': 30, '1d': 900}  # Seconds, by bar interval
+
+# Function to batch-fetch daily bars for several symbols in one request
+@st.cache_data(ttl=30)  # Cache for 30 seconds
+def prefetch_all(symbols, period):
+    try:
+        batch = yf.download(
+            list(symbols),
+            period=period,
+            interval='1d',
+            group_by='ticker',
+            actions=True,
+            ignore_tz=False,
+            threads=True,
+            progress=False
+        )
+    except Exception:
+        return {}
+    
+    # Drop bars without a close so every consumer sees the same complete rows
+    fetched = batch.columns.get_level_values(0)
+    return {
+        symbol: batch[symbol].dropna(subset=['Close'])
+        for symbol in symbols if symbol in fetched
+    }
+
+# Function to shrink OHLCV columns to float32/int32
+def downcast_ohlcv(data):
+    price_cols = [col for col in ['Open', 'High', 'Low', 'Close'] if col in data.columns]
+    dtypes = {col: 'float32' for col in price_cols}
+    if 'Volume' in data.columns:
+        volume = data['Volume']
+        if volume.notna().all() and volume.max() <= np.iinfo(np.int32).max:
+            dtypes['Volume'] = 'int32'
+    return data.astype(dtypes, copy=False)
+
 # Function to get live data
 @st.cache_data(ttl=30)  # Cache for 30 seconds
 def get_live_stock_data(symbol, period):
     try:
-        stock = yf.Ticker(symbol)
-        data = stock.history(period=period, interval='1m' if period in ['1d', '5d'] else '1d')
-        info = stock.info
+        stock = _ticker(symbol)
+        interval = PERIOD_META[period][0]
+        data = file_cache.get(symbol, period, interval, CACHE_TTL[interval])
+        if data is None:
+            if symbol in default_stocks and interval == '1d':
+                # Daily bars for default stocks come from one shared batch so switching is instant
+                data = prefetch_all(tuple(default_stocks), period).get(symbol)
+            if data is None or data.empty:
+                data = stock.history(period=period, interval=interval)
+            data = downcast_ohlcv(data)
+            if not data.empty:
+                file_cache.set(symbol, period, interval, data)
         
         # Calculate technical indicators
         additional_metrics = calculate_technical_indicators(data)
+        avg_volume = float(data['Volume'].mean()) if not data.empty else 0.0
         
-        return data, info, additional_metrics, None
+        return data, additional_metrics, avg_volume, None
     except Exception as e:
-        return None, None, {}, str(e)
+        return None, {}, 0.0, str(e)
 
-# Function to get real-time price
-def get_realtime_price(symbol):
-    try:
-        stock = yf.Ticker(symbol)
-        data = stock.history(period='1d', interval='1m')
-        if not data.empty:
-            return data['Close'].iloc[-1], data.index[-1]
-        return None, None
-    except:
-        return None, None
+# Company fundamentals change daily at most, so keep them out of the refresh path
+COMPANY_INFO_KEYS = ['longName', 'sector', 'industry', 'marketCap', 'trailingPE', 'dividendYield']
+
+@st.cache_data(ttl=86400)  # Cache for 1 day
+def get_company_info(symbol):
+    # Errors propagate so a transient failure isn't cached for the whole day
+    info = _ticker(symbol).info
+    return {key: info[key] for key in COMPANY_INFO_KEYS if key in info}
+
+# Market hours heuristic: weekdays 9:00-16:00 local time
+def market_is_open(now):
+    return now.weekday() < 5 and 9 <= now.hour < 16
+
+OFF_HOURS_REFRESH_INTERVAL = 900  # Bars don't change while the market is closed
+
+# Chart layouts are built once and shared by every refresh
+PRICE_LAYOUT = go.Layout(
+    yaxis_title="Price ($)",
+    xaxis_title="Date/Time",
+    height=600
+)
+LIVE_LAYOUT = go.Layout(
+    yaxis_title="Price ($)",
+    xaxis_title="Time",
+    height=300,
+    showlegend=False
+)
+VOLUME_LAYOUT = go.Layout(
+    yaxis_title="Volume",
+    xaxis_title="Date/Time",
+    height=400
+)
 
 # Main content area
 if selected_stock and selected_stock != 'Custom':
-    # Create placeholder for live updates
-    placeholder = st.empty()
+    # Replay the demo counter the next time the welcome screen shows
+    st.session_state.demo_i = 0
     
-    with placeholder.container():
+    market_open_at_start = market_is_open(datetime.now())
+    live_refresh_interval = refresh_interval if market_open_at_start else OFF_HOURS_REFRESH_INTERVAL
+    
+    # Only this fragment reruns on each refresh; the sidebar and footer stay put
+    @st.fragment(run_every=live_refresh_interval if auto_refresh else None)
+    def live_block():
+        # run_every is fixed at script time, so rerun the app when the market opens or closes
+        if auto_refresh and market_is_open(datetime.now()) != market_open_at_start:
+            st.rerun(scope="app")
+        
         try:
             # Get current time
             current_time = datetime.now()
             
             # Fetch stock data
             with st.spinner(f'🔄 Loading live data for {selected_stock}...'):
-                data, info, additional_metrics, error = get_live_stock_data(
+                data, additional_metrics, avg_volume, error = get_live_stock_data(
                     selected_stock, period_options[selected_period]
                 )
-                current_price, price_timestamp = get_realtime_price(selected_stock)
             
             if error:
                 st.error(f"❌ Error loading data: {error}")
             elif data is not None and not data.empty:
+                # The last bar of the fetched history already carries the live price
+                current_price = data['Close'].iloc[-1]
+                
                 # Update price history for live tracking
                 if current_price:
-                    st.session_state.price_history.append({
-                        'time': current_time,
-                        'price': current_price
-                    })
-                    
-                    # Keep only last 100 price points
-                    if len(st.session_state.price_history) > 100:
-                        st.session_state.price_history = st.session_state.price_history[-100:]
+                    times = st.session_state.price_times
+                    prices = st.session_state.price_values
+                    n = st.session_state.price_count
+                    if n == PRICE_HISTORY_SIZE:
+                        # Buffer is full: slide the window left by one point in place
+                        times[:-1] = times[1:]
+                        prices[:-1] = prices[1:]
+                        n -= 1
+                    times[n] = np.datetime64(current_time, 'ns')
+                    prices[n] = current_price
+                    st.session_state.price_count = n + 1
                 
                 # Display last updated time
-                st.markdown(f'<div class="last-updated">🕐 Last Updated: {current_time.strftime("%H:%M:%S")} | Market Status: {"🟢 Open" if current_time.hour >= 9 and current_time.hour < 16 else "🔴 Closed"}</div>', unsafe_allow_html=True)
+                st.markdown(f'<div class="last-updated">🕐 Last Updated: {current_time.strftime("%H:%M:%S")} | Market Status: {"🟢 Open" if market_is_open(current_time) else "🔴 Closed"}</div>', unsafe_allow_html=True)
                 
                 # Calculate price changes
-                latest_price = current_price or data['Close'].iloc[-1]
-                prev_price = data['Close'].iloc[-2] if len(data) > 1 else latest_price
-                price_change = latest_price - prev_price
+                prev_price = data['Close'].iloc[-2] if len(data) > 1 else current_price
+                price_change = current_price - prev_price
                 price_change_pct = (price_change / prev_price) * 100 if prev_price != 0 else 0
                 
                 # Price alerts
                 if enable_alerts:
-                    if alert_price_high > 0 and latest_price > alert_price_high:
+                    if alert_price_high > 0 and current_price > alert_price_high:
                         st.success(f"🚨 ALERT: {selected_stock} price is above ${alert_price_high:.2f}!")
-                    elif alert_price_low > 0 and latest_price < alert_price_low:
+                    elif alert_price_low > 0 and current_price < alert_price_low:
                         st.error(f"🚨 ALERT: {selected_stock} price is below ${alert_price_low:.2f}!")
                 
                 # Display enhanced key metrics
@@ -278,13 +446,12 @@ if selected_stock and selected_stock != 'Custom':
                 with col1:
                     st.metric(
                         label="💰 Current Price",
-                        value=f"${latest_price:.2f}",
+                        value=f"${current_price:.2f}",
                         delta=f"{price_change:+.2f} ({price_change_pct:+.2f}%)"
                     )
                 
                 with col2:
                     volume = data['Volume'].iloc[-1] if not data.empty else 0
-                    avg_volume = data['Volume'].mean() if not data.empty else 0
                     volume_ratio = (volume / avg_volume) if avg_volume > 0 else 1
                     st.metric(
                         label="📊 Volume",
@@ -308,7 +475,7 @@ if selected_stock and selected_stock != 'Custom':
                 
                 with col5:
                     ma_20 = additional_metrics.get('ma_20')
-                    ma_signal = "Above" if ma_20 and latest_price > ma_20 else "Below" if ma_20 else "N/A"
+                    ma_signal = "Above" if ma_20 and current_price > ma_20 else "Below" if ma_20 else "N/A"
                     st.metric(
                         label="📊 MA(20)",
                         value=f"${ma_20:.2f}" if ma_20 else "N/A",
@@ -325,91 +492,107 @@ if selected_stock and selected_stock != 'Custom':
                     )
                 
                 # Live price movement chart (mini chart)
-                if len(st.session_state.price_history) > 1:
+                n = st.session_state.price_count
+                if n > 1:
                     st.subheader("🔴 Live Price Movement (Last Hour)")
-                    price_df = pd.DataFrame(st.session_state.price_history)
-                    live_fig = px.line(
-                        price_df, 
-                        x='time', 
-                        y='price',
-                        title=f"{selected_stock} Live Price Updates"
-                    )
-                    live_fig.update_layout(
-                        height=300,
-                        showlegend=False,
-                        yaxis_title="Price ($)",
-                        xaxis_title="Time"
+                    live_fig = st.session_state.get('live_fig')
+                    if live_fig is None:
+                        live_fig = go.Figure(
+                            data=go.Scatter(mode='lines', line=dict(color='#00ff00', width=3)),
+                            layout=LIVE_LAYOUT
+                        )
+                        st.session_state.live_fig = live_fig
+                    live_fig.update_traces(
+                        x=st.session_state.price_times[:n],
+                        y=st.session_state.price_values[:n].round(2)
                     )
-                    live_fig.update_traces(line=dict(color='#00ff00', width=3))
-                    st.plotly_chart(live_fig, use_container_width=True)
+                    live_fig.update_layout(title=f"{selected_stock} Live Price Updates")
+                    st.plotly_chart(live_fig, use_container_width=True, key="live")
                 
-                # Main stock chart
+                # Main stock chart (rounded to cents only for display)
+                chart_prices = data[['Open', 'High', 'Low', 'Close']].round(2)
                 st.subheader(f"📈 {selected_stock} Stock Chart - {selected_period}")
                 
-                if chart_type == 'Candlestick':
-                    fig = go.Figure(data=go.Candlestick(
+                # Build the figure once per chart type and only swap its data afterwards
+                fig = st.session_state.get('main_fig')
+                if fig is None or st.session_state.get('main_fig_type') != chart_type:
+                    if chart_type == 'Candlestick':
+                        trace = go.Candlestick(
+                            x=data.index,
+                            open=chart_prices['Open'],
+                            high=chart_prices['High'],
+                            low=chart_prices['Low'],
+                            close=chart_prices['Close'],
+                            name=selected_stock
+                        )
+                    elif chart_type == 'Line Chart':
+                        trace = go.Scatter(
+                            x=data.index,
+                            y=chart_prices['Close'],
+                            mode='lines',
+                            line=dict(color='#1f77b4', width=2)
+                        )
+                    else:  # Area Chart
+                        trace = go.Scatter(
+                            x=data.index,
+                            y=chart_prices['Close'],
+                            mode='lines',
+                            fill='tozeroy'
+                        )
+                    fig = go.Figure(data=trace, layout=PRICE_LAYOUT)
+                    
+                    st.session_state.main_fig = fig
+                    st.session_state.main_fig_type = chart_type
+                
+                elif chart_type == 'Candlestick':
+                    fig.update_traces(
                         x=data.index,
-                        open=data['Open'],
-                        high=data['High'],
-                        low=data['Low'],
-                        close=data['Close'],
+                        open=chart_prices['Open'],
+                        high=chart_prices['High'],
+                        low=chart_prices['Low'],
+                        close=chart_prices['Close'],
                         name=selected_stock
-                    ))
-                    fig.update_layout(
-                        title=f"{selected_stock} Candlestick Chart",
-                        yaxis_title="Price ($)",
-                        xaxis_title="Date/Time",
-                        height=600
-                    )
-                    
-                elif chart_type == 'Line Chart':
-                    fig = px.line(
-                        x=data.index, 
-                        y=data['Close'],
-                        title=f"{selected_stock} Price Movement"
-                    )
-                    fig.update_layout(
-                        yaxis_title="Price ($)",
-                        xaxis_title="Date/Time",
-                        height=600
-                    )
-                    fig.update_traces(line=dict(color='#1f77b4', width=2))
-                    
-                else:  # Area Chart
-                    fig = px.area(
-                        x=data.index, 
-                        y=data['Close'],
-                        title=f"{selected_stock} Price Movement"
-                    )
-                    fig.update_layout(
-                        yaxis_title="Price ($)",
-                        xaxis_title="Date/Time",
-                        height=600
                     )
                 
-                st.plotly_chart(fig, use_container_width=True)
+                else:
+                    fig.update_traces(x=data.index, y=chart_prices['Close'])
+                
+                chart_title = "Candlestick Chart" if chart_type == 'Candlestick' else "Price Movement"
+                fig.update_layout(title=f"{selected_stock} {chart_title}")
+                
+                st.plotly_chart(fig, use_container_width=True, key="main")
                 
                 # Volume chart
                 st.subheader("📊 Volume Analysis")
-                vol_fig = px.bar(
-                    x=data.index, 
-                    y=data['Volume'],
-                    title=f"{selected_stock} Trading Volume"
-                )
-                vol_fig.update_layout(
-                    yaxis_title="Volume",
-                    xaxis_title="Date/Time",
-                    height=400
-                )
+                vol_fig = go.Figure(
+                    data=go.Bar(x=data.index, y=data['Volume']),
+                    layout=VOLUME_LAYOUT
+                ).update_layout(title=f"{selected_stock} Trading Volume")
                 st.plotly_chart(vol_fig, use_container_width=True)
                 
                 # Real-time data table
                 st.subheader("📋 Recent Live Data")
-                recent_data = data.tail(10).round(2)
-                recent_data.index = recent_data.index.strftime('%H:%M:%S' if selected_period in ['1d', '5d'] else '%Y-%m-%d')
-                st.dataframe(recent_data, use_container_width=True)
+                price_format = st.column_config.NumberColumn(format="$%.2f")
+                st.dataframe(
+                    data.tail(10),
+                    use_container_width=True,
+                    hide_index=False,
+                    column_config={
+                        '_index': st.column_config.DatetimeColumn(
+                            format=PERIOD_META[period_options[selected_period]][1]
+                        ),
+                        'Open': price_format,
+                        'High': price_format,
+                        'Low': price_format,
+                        'Close': price_format
+                    }
+                )
                 
                 # Company info
+                try:
+                    info = get_company_info(selected_stock)
+                except Exception:
+                    info = {}
                 if info and 'longName' in info:
                     st.subheader("🏢 Company Information")
                     col1, col2 = st.columns(2)
@@ -435,10 +618,7 @@ if selected_stock and selected_stock != 'Custom':
             st.error(f"❌ Error loading live data: {str(e)}")
             st.info("Please check your internet connection and try again.")
     
-    # Auto-refresh mechanism
-    if auto_refresh:
-        time.sleep(refresh_interval)
-        st.rerun()
+    live_block()
 
 else:
     # Welcome message
@@ -446,13 +626,22 @@ else:
     
     # Demo live counter
     st.subheader("🔴 Live Demo Counter")
-    demo_counter = st.empty()
     
-    for i in range(10):
-        demo_counter.metric("Live Counter", f"{i + 1}/10")
-        time.sleep(1)
+    # Ticks once a second without blocking the script thread
+    @st.fragment(run_every=1)
+    def demo():
+        i = st.session_state.setdefault('demo_i', 0) + 1
+        st.session_state.demo_i = i
+        if i == 10:
+            # Leave the fragment so it stops being rescheduled
+            st.rerun(scope="app")
+        st.metric("Live Counter", f"{i}/10")
     
-    st.success("✅ Live functionality is working! Select a stock to see real data.")
+    if st.session_state.get('demo_i', 0) < 10:
+        demo()
+    else:
+        st.metric("Live Counter", "10/10")
+        st.success("✅ Live functionality is working! Select a stock to see real data.")
 
 # Footer with live status
 st.markdown("---")